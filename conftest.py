@@ -0,0 +1 @@
+# Makes `src.polymoney` importable from the tests, matching `python -m src.polymoney.ingest`.
@@ -21,6 +21,8 @@ class Settings:
     active_positions_page_size: int
     # DB/ingest batching
     insert_batch_size: int
+    # Re-sync users with an unchanged leaderboard fingerprint at least this often (0 = always)
+    fingerprint_max_staleness_seconds: float
     # DB pool tuning
     db_pool_size: int
     db_max_overflow: int
@@ -40,6 +42,7 @@ def get_settings() -> Settings:
         closed_positions_page_size=int(os.getenv("CLOSED_POSITIONS_PAGE_SIZE", "100")),
         active_positions_page_size=int(os.getenv("ACTIVE_POSITIONS_PAGE_SIZE", "100")),
         insert_batch_size=int(os.getenv("INSERT_BATCH_SIZE", "500")),
+        fingerprint_max_staleness_seconds=float(os.getenv("FINGERPRINT_MAX_STALENESS_SECONDS", "21600")),
         db_pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
         db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
     )
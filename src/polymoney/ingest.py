@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import os
-from typing import Any, Dict, List, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError
 
 from .db import get_engine, session_scope
 from .logging_setup import configure_logging
@@ -15,7 +16,7 @@ from .config import get_settings
 import structlog
 from datetime import datetime, timezone
 
-from .models import Base, ClosedPosition, Market, User, ActivePosition
+from .models import Base, ClosedPosition, Market, User, ActivePosition, QuarantinedRow, UserSyncState
 from .polymarket_client import LeaderboardEntry, PolymarketClient
 
 
@@ -106,6 +107,184 @@ def normalize_active_position(raw: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _compact_error(e: BaseException, max_len: int = 800) -> str:
+    """Truncate error text to avoid giant parameter dumps in logs and quarantine rows."""
+    err_msg = str(e)
+    if len(err_msg) > max_len:
+        err_msg = err_msg[:max_len] + "..."
+    return err_msg
+
+
+# SQLSTATE classes caused by the values of a row: 22 data exception, 23 integrity
+# constraint violation. Anything else (connection, schema) is not bisected.
+_ROW_ERROR_SQLSTATE_CLASSES = ("22", "23")
+
+
+def _is_row_error(e: DBAPIError) -> bool:
+    # asyncpg errors reach us as a plain DBAPIError with the SQLSTATE on .orig
+    sqlstate = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+    if sqlstate:
+        return str(sqlstate).startswith(_ROW_ERROR_SQLSTATE_CLASSES)
+    return isinstance(e, (DataError, IntegrityError))
+
+
+def _quarantine_entry(target_table: str, error_type: str, error: str, raw_json: Optional[str]) -> Dict[str, Any]:
+    return {"target_table": target_table, "error_type": error_type, "error": error, "raw_json": raw_json}
+
+
+async def _try_chunk(
+    session,
+    rows: List[Dict[str, Any]],
+    execute_chunk: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+) -> Optional[DBAPIError]:
+    """Run execute_chunk inside a savepoint; return the row-level error instead of raising it."""
+    try:
+        async with session.begin_nested():
+            await execute_chunk(rows)
+        return None
+    except DBAPIError as e:
+        if not _is_row_error(e):
+            raise
+        return e
+
+
+async def _execute_bisecting(
+    session,
+    rows: List[Dict[str, Any]],
+    execute_chunk: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+    target_table: str,
+    quarantine: Optional[List[Dict[str, Any]]],
+    raw_json_for: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+) -> int:
+    """
+    Write rows via execute_chunk inside a savepoint. On a row-level error, split the
+    chunk in half and retry each side until the offending rows are isolated; those are
+    appended to quarantine (or the error is re-raised when quarantine is None).
+    Retries are capped at about one savepoint per row, i.e. never more statements than
+    writing row by row; sub-chunks still failing when the budget runs out are
+    quarantined whole. Returns number of rows written.
+    """
+    if not rows:
+        return 0
+    error = await _try_chunk(session, rows, execute_chunk)
+    if error is None:
+        return len(rows)
+    if quarantine is None:
+        raise error
+
+    attempts_left = len(rows)
+
+    def _quarantine(failed: List[Dict[str, Any]], e: Exception) -> None:
+        error_type = type(getattr(e, "orig", None) or e).__name__
+        for row in failed:
+            raw_json = raw_json_for(row) if raw_json_for else row.get("raw_json")
+            quarantine.append(_quarantine_entry(
+                target_table,
+                error_type,
+                _compact_error(e),
+                raw_json or json.dumps(row, ensure_ascii=False, default=str),
+            ))
+
+    async def _bisect(failed: List[Dict[str, Any]], e: Exception) -> int:
+        nonlocal attempts_left
+        if len(failed) == 1 or attempts_left < 2:
+            _quarantine(failed, e)
+            return 0
+        mid = len(failed) // 2
+        written = 0
+        for half in (failed[:mid], failed[mid:]):
+            attempts_left -= 1
+            err = await _try_chunk(session, half, execute_chunk)
+            written += len(half) if err is None else await _bisect(half, err)
+        return written
+
+    return await _bisect(rows, error)
+
+
+async def save_quarantined_rows(session, user: User, quarantine: List[Dict[str, Any]]) -> int:
+    """
+    Persist rows isolated by bulk writes so they can be inspected without refetching the user.
+    A row already quarantined for this user and table is kept as is, so re-syncs add no duplicates.
+    """
+    if not quarantine:
+        return 0
+    now_dt = datetime.now(timezone.utc)
+    rows = [
+        {
+            **q,
+            "user_pk": user.id,
+            "raw_sha256": hashlib.sha256((q.get("raw_json") or "").encode()).hexdigest(),
+            "created_at": now_dt,
+        }
+        for q in quarantine
+    ]
+    stmt = pg_insert(QuarantinedRow).values(rows).on_conflict_do_nothing(constraint="uq_quarantined_rows_dedupe")
+    await session.execute(stmt)
+    return len(rows)
+
+
+def leaderboard_fingerprint(entry: LeaderboardEntry) -> Optional[str]:
+    """
+    Hash of the leaderboard stats that move when a trader's positions change.
+    Rank is left out: it shifts whenever anyone above or below trades.
+    Returns None when the entry carries no stats, so the user is always synced.
+    """
+    if entry.pnl is None and entry.volume is None:
+        return None
+    pnl = "" if entry.pnl is None else f"{entry.pnl:.2f}"
+    volume = "" if entry.volume is None else f"{entry.volume:.2f}"
+    return hashlib.sha256(f"{pnl}|{volume}".encode()).hexdigest()
+
+
+async def load_sync_states(session, user_ids: List[str]) -> Dict[str, Tuple[str | None, datetime | None]]:
+    """Returns mapping user_id -> (fingerprint, last_synced_at) for already synced users."""
+    if not user_ids:
+        return {}
+    rows = (
+        await session.execute(
+            select(User.user_id, UserSyncState.fingerprint, UserSyncState.last_synced_at)
+            .join(UserSyncState, UserSyncState.user_pk == User.id)
+            .where(User.user_id.in_(user_ids))
+        )
+    ).all()
+    return {user_id: (fingerprint, last_synced_at) for user_id, fingerprint, last_synced_at in rows}
+
+
+def sync_status(
+    fingerprint: Optional[str],
+    state: Optional[Tuple[str | None, datetime | None]],
+    now_dt: datetime,
+    max_staleness_seconds: float,
+) -> Tuple[bool, bool]:
+    """
+    Returns (due, changed). A user is changed when there is no usable fingerprint
+    to compare against; an unchanged user is due once the last sync is too old.
+    """
+    if fingerprint is None or state is None:
+        return True, True
+    last_fingerprint, last_synced_at = state
+    if last_fingerprint != fingerprint or last_synced_at is None:
+        return True, True
+    return (now_dt - last_synced_at).total_seconds() >= max_staleness_seconds, False
+
+
+async def upsert_sync_state(session, user: User, entry: LeaderboardEntry, fingerprint: Optional[str]) -> None:
+    row = {
+        "user_pk": user.id,
+        "fingerprint": fingerprint,
+        "pnl": entry.pnl,
+        "volume": entry.volume,
+        "rank": entry.rank,
+        "last_synced_at": datetime.now(timezone.utc),
+    }
+    insert_stmt = pg_insert(UserSyncState).values(row)
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[UserSyncState.__table__.c.user_pk],
+        set_={col: getattr(insert_stmt.excluded, col) for col in row if col != "user_pk"},
+    )
+    await session.execute(stmt)
+
+
 async def upsert_user(session, entry: LeaderboardEntry) -> User:
     existing = (await session.execute(select(User).where(User.user_id == entry.user_id))).scalar_one_or_none()
     if existing:
@@ -118,10 +297,15 @@ async def upsert_user(session, entry: LeaderboardEntry) -> User:
     return obj
 
 
-async def bulk_upsert_markets(session, norms: List[Dict[str, Any]]) -> Dict[str, int]:
+async def bulk_upsert_markets(
+    session,
+    norms: List[Dict[str, Any]],
+    quarantine: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, int]:
     """
     Ensure all markets from normalized closed positions exist.
     Returns mapping market_external_id -> market_pk.
+    Markets rejected by the DB are moved to quarantine when it is given.
     """
     market_ids = {str(n.get("market_external_id")) for n in norms if n.get("market_external_id")}
     if not market_ids:
@@ -138,22 +322,35 @@ async def bulk_upsert_markets(session, norms: List[Dict[str, Any]]) -> Dict[str,
     if missing_ids:
         rows_to_insert: List[Dict[str, Any]] = []
         slug_title_map: Dict[str, Tuple[str | None, str | None]] = {}
+        # Source payload per market, so a rejected market is quarantined with real API data
+        raw_json_map: Dict[str, str | None] = {}
         for n in norms:
             mid = str(n.get("market_external_id"))
             if not mid or mid in slug_title_map:
                 continue
             slug_title_map[mid] = (n.get("market_slug"), n.get("market_title"))
+            raw_json_map[mid] = n.get("raw_json")
         for mid in missing_ids:
             slug, title = slug_title_map.get(mid, (None, None))
             rows_to_insert.append({"market_id": mid, "slug": slug, "title": title})
 
         if rows_to_insert:
-            stmt = (
-                pg_insert(Market)
-                .values(rows_to_insert)
-                .on_conflict_do_nothing(index_elements=[Market.__table__.c.market_id])
+            async def _insert_markets(chunk: List[Dict[str, Any]]) -> None:
+                stmt = (
+                    pg_insert(Market)
+                    .values(chunk)
+                    .on_conflict_do_nothing(index_elements=[Market.__table__.c.market_id])
+                )
+                await session.execute(stmt)
+
+            await _execute_bisecting(
+                session,
+                rows_to_insert,
+                _insert_markets,
+                Market.__tablename__,
+                quarantine,
+                raw_json_for=lambda row: raw_json_map.get(row["market_id"]),
             )
-            await session.execute(stmt)
             # Reload to capture IDs
             existing_rows = (
                 await session.execute(select(Market).where(Market.market_id.in_(list(market_ids))))
@@ -163,15 +360,32 @@ async def bulk_upsert_markets(session, norms: List[Dict[str, Any]]) -> Dict[str,
     return id_map
 
 
-async def bulk_insert_closed_positions(session, user: User, norms: List[Dict[str, Any]], market_id_map: Dict[str, int]) -> int:
-    """Insert closed positions in bulk; ignore duplicates by unique constraint."""
+async def bulk_insert_closed_positions(
+    session,
+    user: User,
+    norms: List[Dict[str, Any]],
+    market_id_map: Dict[str, int],
+    quarantine: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    """
+    Insert closed positions in bulk; ignore duplicates by unique constraint.
+    Rows rejected by the DB are moved to quarantine when it is given.
+    """
     if not norms:
         return 0
     rows: List[Dict[str, Any]] = []
     for n in norms:
-        mid = str(n.get("market_external_id")) if n.get("market_external_id") is not None else None
+        mid = str(n.get("market_external_id")) if n.get("market_external_id") else None
         market_pk = market_id_map.get(mid) if mid is not None else None
         if not market_pk:
+            # Market row was rejected; keep the position's payload rather than dropping it
+            if mid is not None and quarantine is not None:
+                quarantine.append(_quarantine_entry(
+                    ClosedPosition.__tablename__,
+                    "MarketQuarantined",
+                    f"market quarantined: {mid}",
+                    n.get("raw_json"),
+                ))
             continue
         rows.append({
             "user_pk": user.id,
@@ -190,17 +404,27 @@ async def bulk_insert_closed_positions(session, user: User, norms: List[Dict[str
         })
     if not rows:
         return 0
+
+    async def _insert_chunk(chunk: List[Dict[str, Any]]) -> None:
+        stmt = pg_insert(ClosedPosition).values(chunk).on_conflict_do_nothing(constraint="uq_positions_closed_dedupe")
+        await session.execute(stmt)
+
     settings = get_settings()
     total_inserted = 0
     for i in range(0, len(rows), settings.insert_batch_size):
         chunk = rows[i:i + settings.insert_batch_size]
-        stmt = pg_insert(ClosedPosition).values(chunk).on_conflict_do_nothing(constraint="uq_positions_closed_dedupe")
-        await session.execute(stmt)
-        total_inserted += len(chunk)
+        total_inserted += await _execute_bisecting(
+            session, chunk, _insert_chunk, ClosedPosition.__tablename__, quarantine
+        )
     return total_inserted
 
 
-async def bulk_upsert_active_positions(session, user: User, norms: List[Dict[str, Any]]) -> int:
+async def bulk_upsert_active_positions(
+    session,
+    user: User,
+    norms: List[Dict[str, Any]],
+    quarantine: Optional[List[Dict[str, Any]]] = None,
+) -> int:
     if not norms:
         return 0
     now_dt = datetime.now(timezone.utc)
@@ -222,10 +446,8 @@ async def bulk_upsert_active_positions(session, user: User, norms: List[Dict[str
         key = (r["user_pk"], str(r["asset"]))
         unique_by_key[key] = r  # keep the last occurrence
     rows = list(unique_by_key.values())
-    settings = get_settings()
-    total_upserted = 0
-    for i in range(0, len(rows), settings.insert_batch_size):
-        chunk = rows[i:i + settings.insert_batch_size]
+
+    async def _upsert_chunk(chunk: List[Dict[str, Any]]) -> None:
         insert_stmt = pg_insert(ActivePosition)
         # Build update mapping tied to this insert statement's EXCLUDED
         updatable_cols = [
@@ -238,7 +460,14 @@ async def bulk_upsert_active_positions(session, user: User, norms: List[Dict[str
             set_=update_dict,
         )
         await session.execute(stmt)
-        total_upserted += len(chunk)
+
+    settings = get_settings()
+    total_upserted = 0
+    for i in range(0, len(rows), settings.insert_batch_size):
+        chunk = rows[i:i + settings.insert_batch_size]
+        total_upserted += await _execute_bisecting(
+            session, chunk, _upsert_chunk, ActivePosition.__tablename__, quarantine
+        )
     return total_upserted
 
 
@@ -258,7 +487,38 @@ async def ingest_once(limit: int = 500, active_max_total: int | None = None, clo
         leaderboard = await client.fetch_leaderboard_top(limit=limit, time_period="month", order_by="PNL", category="overall")
         log.info("leaderboard_fetched", count=len(leaderboard))
 
-        sem = asyncio.Semaphore(get_settings().max_concurrency)
+        settings = get_settings()
+        fingerprints = {entry.user_id: leaderboard_fingerprint(entry) for entry in leaderboard}
+        async with session_scope() as session:
+            sync_states = await load_sync_states(session, list(fingerprints))
+
+        # Skip users whose leaderboard stats are unchanged since their last sync,
+        # unless that sync is older than the staleness bound
+        now_dt = datetime.now(timezone.utc)
+        planned: List[Tuple[int, LeaderboardEntry, bool]] = []
+        for idx, entry in enumerate(leaderboard, start=1):
+            due, changed = sync_status(
+                fingerprints[entry.user_id],
+                sync_states.get(entry.user_id),
+                now_dt,
+                settings.fingerprint_max_staleness_seconds,
+            )
+            if due:
+                planned.append((idx, entry, changed))
+
+        # Changed users first; unchanged ones due only to staleness go last
+        planned.sort(key=lambda item: not item[2])
+        log.info(
+            "sweep_planned",
+            due=len(planned),
+            changed=sum(1 for _, _, changed in planned if changed),
+            skipped=len(leaderboard) - len(planned),
+        )
+
+        # Capped fetches store only a sample of positions, so they must not count as a sync
+        full_fetch = closed_max_total is None and active_max_total is None
+
+        sem = asyncio.Semaphore(settings.max_concurrency)
 
         async def process_entry(idx: int, entry: LeaderboardEntry) -> None:
             async with sem:
@@ -277,23 +537,54 @@ async def ingest_once(limit: int = 500, active_max_total: int | None = None, clo
                         an["icon"] = None  # drop large payloads
                         active_norms.append(an)
 
+                    # Rows the DB rejects are isolated by bisection and kept here
+                    # instead of rolling back the whole user
+                    quarantine: List[Dict[str, Any]] = []
                     try:
                         # Markets and closed positions in bulk
-                        market_id_map = await bulk_upsert_markets(session, closed_norms)
-                        closed_saved = await bulk_insert_closed_positions(session, user, closed_norms, market_id_map)
+                        market_id_map = await bulk_upsert_markets(session, closed_norms, quarantine)
+                        closed_saved = await bulk_insert_closed_positions(
+                            session, user, closed_norms, market_id_map, quarantine
+                        )
 
                         # Active positions in bulk upsert
-                        active_saved = await bulk_upsert_active_positions(session, user, active_norms)
-
-                        log.info("user_done", user=entry.user_id, closed_saved=closed_saved, active_saved=active_saved)
+                        active_saved = await bulk_upsert_active_positions(session, user, active_norms, quarantine)
+
+                        quarantined = await save_quarantined_rows(session, user, quarantine)
+                        if quarantined:
+                            log.warning(
+                                "user_rows_quarantined",
+                                user=entry.user_id,
+                                count=quarantined,
+                                tables=sorted({q["target_table"] for q in quarantine}),
+                            )
+
+                        # Nothing written but rows quarantined: keep the user due for the next sweep
+                        stored_nothing = quarantined and not (closed_saved or active_saved)
+                        if full_fetch and not stored_nothing:
+                            await upsert_sync_state(session, user, entry, fingerprints[entry.user_id])
+                            if quarantined:
+                                # Partial sync: user is skipped until the staleness bound despite quarantined rows
+                                log.warning(
+                                    "user_synced_partially",
+                                    user=entry.user_id,
+                                    closed_saved=closed_saved,
+                                    active_saved=active_saved,
+                                    quarantined=quarantined,
+                                )
+
+                        log.info(
+                            "user_done",
+                            user=entry.user_id,
+                            closed_saved=closed_saved,
+                            active_saved=active_saved,
+                            quarantined=quarantined,
+                        )
                     except Exception as e:
                         # Compact error logging, avoid giant parameter dumps
-                        err_msg = str(e)
-                        if len(err_msg) > 800:
-                            err_msg = err_msg[:800] + "..."
-                        log.error("user_failed", user=entry.user_id, error_type=type(e).__name__, error=err_msg)
+                        log.error("user_failed", user=entry.user_id, error_type=type(e).__name__, error=_compact_error(e))
 
-        await asyncio.gather(*(process_entry(idx, entry) for idx, entry in enumerate(leaderboard, start=1)))
+        await asyncio.gather(*(process_entry(idx, entry) for idx, entry, _ in planned))
 
 
 if __name__ == "__main__":
@@ -111,4 +111,40 @@ class ActivePosition(Base):
     )
 
 
+class UserSyncState(Base):
+    """Leaderboard fingerprint of a user as of their last successful sync."""
 
+    __tablename__ = "user_sync_state"
+
+    user_pk: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    pnl: Mapped[Optional[float]] = mapped_column(Numeric(38, 8), nullable=True)
+    volume: Mapped[Optional[float]] = mapped_column(Numeric(38, 8), nullable=True)
+    rank: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True, nullable=True)
+
+
+class QuarantinedRow(Base):
+    """Row that a bulk write rejected, kept with its error so the rest of the batch can commit."""
+
+    __tablename__ = "quarantined_rows"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_pk: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=True)
+
+    target_table: Mapped[str] = mapped_column(String(64), index=True)
+    error_type: Mapped[str] = mapped_column(String(128))
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    raw_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    raw_sha256: Mapped[str] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_pk",
+            "target_table",
+            "raw_sha256",
+            name="uq_quarantined_rows_dedupe",
+        ),
+    )
@@ -16,6 +16,24 @@ from .config import get_settings
 class LeaderboardEntry:
     user_id: str
     display_name: Optional[str]
+    # Stats reported by the leaderboard for the requested time period
+    pnl: Optional[float] = None
+    volume: Optional[float] = None
+    rank: Optional[int] = None
+
+
+def _to_float(val: Any) -> Optional[float]:
+    try:
+        return float(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(val: Any) -> Optional[int]:
+    try:
+        return int(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
 
 
 class PolymarketClient:
@@ -66,7 +84,15 @@ class PolymarketClient:
                 user_addr = item.get("proxyWallet") or item.get("user")
                 name = item.get("userName") or item.get("name")
                 if user_addr:
-                    entries.append(LeaderboardEntry(user_id=user_addr, display_name=name))
+                    entries.append(
+                        LeaderboardEntry(
+                            user_id=user_addr,
+                            display_name=name,
+                            pnl=_to_float(item.get("pnl")),
+                            volume=_to_float(item.get("vol") if item.get("vol") is not None else item.get("volume")),
+                            rank=_to_int(item.get("rank")),
+                        )
+                    )
             if len(data) < params["limit"]:
                 break
             offset += params["limit"]
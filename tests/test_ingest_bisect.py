@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DataError, DBAPIError, OperationalError
+
+from src.polymoney.ingest import _execute_bisecting
+
+
+class _Savepoint:
+    async def __aenter__(self) -> "_Savepoint":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> bool:
+        return False
+
+
+class _StubSession:
+    def begin_nested(self) -> _Savepoint:
+        return _Savepoint()
+
+
+def _run(rows, execute_chunk, quarantine):
+    return asyncio.run(_execute_bisecting(_StubSession(), rows, execute_chunk, "positions_closed", quarantine))
+
+
+def test_one_bad_row_is_quarantined_and_the_rest_written() -> None:
+    rows = [{"side": "Yes", "raw_json": f'{{"i": {i}}}'} for i in range(50)]
+    rows[17]["side"] = "way-too-long"
+    written = []
+
+    async def execute_chunk(chunk):
+        if any(len(r["side"]) > 8 for r in chunk):
+            raise DataError("INSERT", {}, Exception("value too long for type character varying(8)"))
+        written.extend(chunk)
+
+    quarantine = []
+    assert _run(rows, execute_chunk, quarantine) == 49
+    assert len(written) == 49
+    assert len(quarantine) == 1
+    assert quarantine[0]["raw_json"] == '{"i": 17}'
+    assert quarantine[0]["target_table"] == "positions_closed"
+
+
+def test_non_row_error_is_raised_without_bisecting() -> None:
+    rows = [{"side": "Yes"} for _ in range(500)]
+    calls = 0
+
+    async def execute_chunk(chunk):
+        nonlocal calls
+        calls += 1
+        raise OperationalError("INSERT", {}, Exception("connection is closed"))
+
+    quarantine = []
+    with pytest.raises(OperationalError):
+        _run(rows, execute_chunk, quarantine)
+    assert calls == 1
+    assert quarantine == []
+
+
+class _AsyncpgError(Exception):
+    """Mimics the asyncpg dialect's translated error, which carries the SQLSTATE."""
+
+    def __init__(self, message: str, sqlstate: str) -> None:
+        super().__init__(message)
+        self.sqlstate = sqlstate
+
+
+def test_asyncpg_value_too_long_is_bisected() -> None:
+    rows = [{"side": "Yes", "raw_json": f'{{"i": {i}}}'} for i in range(20)]
+    rows[5]["side"] = "way-too-long"
+
+    async def execute_chunk(chunk):
+        if any(len(r["side"]) > 8 for r in chunk):
+            raise DBAPIError("INSERT", {}, _AsyncpgError("value too long for type character varying(8)", "22001"))
+
+    quarantine = []
+    assert _run(rows, execute_chunk, quarantine) == 19
+    assert [q["raw_json"] for q in quarantine] == ['{"i": 5}']
+
+
+def test_bad_rows_in_both_halves_keep_the_good_rows() -> None:
+    rows = [{"side": "Yes", "raw_json": f'{{"i": {i}}}'} for i in range(500)]
+    rows[10]["side"] = rows[400]["side"] = "way-too-long"
+    written = []
+
+    async def execute_chunk(chunk):
+        if any(len(r["side"]) > 8 for r in chunk):
+            raise DBAPIError("INSERT", {}, _AsyncpgError("value too long", "22001"))
+        written.extend(chunk)
+
+    quarantine = []
+    assert _run(rows, execute_chunk, quarantine) == 498
+    assert len(written) == 498
+    assert sorted(q["raw_json"] for q in quarantine) == ['{"i": 10}', '{"i": 400}']
+
+
+def test_all_failing_chunk_is_bounded_by_row_count() -> None:
+    rows = [{"side": "Yes"} for _ in range(500)]
+    calls = 0
+
+    async def execute_chunk(chunk):
+        nonlocal calls
+        calls += 1
+        raise DataError("INSERT", {}, Exception("invalid input"))
+
+    quarantine = []
+    assert _run(rows, execute_chunk, quarantine) == 0
+    assert calls <= 1 + len(rows) + 10
+    assert len(quarantine) == 500
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from src.polymoney.ingest import leaderboard_fingerprint, sync_status
+from src.polymoney.polymarket_client import LeaderboardEntry
+
+MAX_STALENESS = 6 * 3600
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _entry(**stats) -> LeaderboardEntry:
+    return LeaderboardEntry(user_id="0xabc", display_name="trader", **stats)
+
+
+def test_fingerprint_ignores_rank() -> None:
+    assert leaderboard_fingerprint(_entry(pnl=10.0, volume=250.0, rank=3)) == leaderboard_fingerprint(
+        _entry(pnl=10.0, volume=250.0, rank=7)
+    )
+    assert leaderboard_fingerprint(_entry(pnl=10.0, volume=250.0)) != leaderboard_fingerprint(
+        _entry(pnl=10.0, volume=251.0)
+    )
+
+
+def test_unchanged_fingerprint_is_skipped_within_staleness_window() -> None:
+    fingerprint = leaderboard_fingerprint(_entry(pnl=10.0, volume=250.0))
+    state = (fingerprint, NOW - timedelta(hours=1))
+    assert sync_status(fingerprint, state, NOW, MAX_STALENESS) == (False, False)
+
+
+def test_unchanged_fingerprint_is_due_outside_staleness_window() -> None:
+    fingerprint = leaderboard_fingerprint(_entry(pnl=10.0, volume=250.0))
+    state = (fingerprint, NOW - timedelta(hours=7))
+    assert sync_status(fingerprint, state, NOW, MAX_STALENESS) == (True, False)
+
+
+def test_changed_fingerprint_is_due() -> None:
+    fingerprint = leaderboard_fingerprint(_entry(pnl=10.0, volume=250.0))
+    state = ("stale", NOW - timedelta(minutes=5))
+    assert sync_status(fingerprint, state, NOW, MAX_STALENESS) == (True, True)
+
+
+def test_missing_fingerprint_is_always_due() -> None:
+    assert leaderboard_fingerprint(_entry()) is None
+    state = (None, NOW - timedelta(minutes=5))
+    assert sync_status(None, state, NOW, MAX_STALENESS) == (True, True)